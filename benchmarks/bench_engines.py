@@ -0,0 +1,70 @@
+"""Compare the resolution engines on cache misses.
+
+Every lookup resolves a tuple of subclasses of registered classes with the
+dispatch cache disabled, so the numbers measure the engines themselves.
+
+Run with ``python benchmarks/bench_engines.py`` with the package installed.
+"""
+
+import random
+import timeit
+
+from multiarg_dispatch import multidispatch
+
+ARITY = 4
+SIZES = (10, 100, 1000)
+ENGINES = ("scan", "index", "bitset", "tree", "mro")
+N_QUERIES = 100
+
+
+def make_signatures(size, rng):
+    roots = [type(f"Root{i}", (), {}) for i in range(8)]
+    signatures = []
+    for i in range(size):
+        leaf = type(f"Leaf{i}", (rng.choice(roots),), {})
+        signatures.append((leaf, *(rng.choice(roots) for _ in range(ARITY - 1))))
+    return signatures
+
+
+def make_queries(signatures, rng):
+    queries = []
+    for signature in rng.sample(signatures, min(N_QUERIES, len(signatures))):
+        queries.append(tuple(type("Query", (cls,), {}) for cls in signature))
+    return queries
+
+
+def build(engine, signatures):
+    @multidispatch(maxsize=0, engine=engine)
+    def generic(a, b, c, d):
+        return None
+
+    for signature in signatures:
+
+        def impl(a, b, c, d):
+            return None
+
+        impl.__annotations__ = dict(zip("abcd", signature))
+        generic.register(impl)
+    return generic
+
+
+def main():
+    rng = random.Random(0)
+    print(f"{'registrations':>13} " + " ".join(f"{e:>10}" for e in ENGINES))
+    for size in SIZES:
+        signatures = make_signatures(size, rng)
+        queries = make_queries(signatures, rng)
+        timings = []
+        for engine in ENGINES:
+            dispatch = build(engine, signatures).dispatch
+            best = min(
+                timeit.repeat(
+                    lambda: [dispatch(q) for q in queries], number=5, repeat=3
+                )
+            )
+            timings.append(best / (5 * len(queries)) * 1e6)
+        print(f"{size:>13} " + " ".join(f"{t:>8.2f}us" for t in timings))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Compare registering 1,000 implementations one by one and in bulk.
+
+Each implementation dispatches on its own class in the first position, as
+plugin packages registering a handler per type do. The dispatch cache is
+filled with a call per class before registering, so the one-by-one path
+pays the cache invalidation on every registration.
+
+Run with ``python benchmarks/bench_register.py`` with the package installed.
+"""
+
+import time
+import warnings
+
+from multiarg_dispatch import multidispatch
+
+
+def make_impls(classes):
+    impls = []
+    for cls in classes:
+
+        def impl(x, y):
+            return None
+
+        impl.__annotations__ = {"x": cls, "y": int}
+        impls.append(impl)
+    return impls
+
+
+def make_generic():
+    @multidispatch(maxsize=None)
+    def generic(x, y):
+        return None
+
+    @generic.register
+    def _(x: object, y: str) -> None:
+        return None
+
+    return generic
+
+
+def one_by_one(generic, impls):
+    for impl in impls:
+        generic.register(impl)
+
+
+def bulk(generic, impls):
+    with generic.bulk_register():
+        for impl in impls:
+            generic.register(impl)
+
+
+def main():
+    classes = [type(f"Plugin{i}", (), {}) for i in range(1000)]
+    impls = make_impls(classes)
+    instances = [cls() for cls in classes]
+    for name, register in (("one by one", one_by_one), ("bulk", bulk)):
+        best = float("inf")
+        for _ in range(5):
+            generic = make_generic()
+            for instance in instances:
+                generic(instance, 1)
+            start = time.perf_counter()
+            register(generic, impls)
+            best = min(best, time.perf_counter() - start)
+        print(f"{name:>10}: {best * 1e3:.1f}ms for {len(impls)} registrations")
+
+
+if __name__ == "__main__":
+    warnings.simplefilter("ignore")
+    main()
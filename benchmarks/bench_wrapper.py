@@ -0,0 +1,53 @@
+"""Compare the generated fixed-arity wrapper with the generic call path.
+
+The generic path is the wrapper used before the generated one: it builds a
+list of argument classes, extends it with the keyword argument classes and
+converts it to a tuple before calling dispatch(). Positional, mixed and
+keyword calls are measured.
+
+Run with ``python benchmarks/bench_wrapper.py`` with the package installed.
+"""
+
+import timeit
+
+from multiarg_dispatch import multidispatch
+
+
+@multidispatch
+def generic(a, b):
+    return None
+
+
+@generic.register
+def _(a: int, b: str) -> None:
+    return None
+
+
+dispatch = generic.dispatch
+
+
+def generic_call_path(*args, **kw):
+    cls_args = [arg.__class__ for arg in args]
+    if kw is not None:
+        cls_kw = [type(value) for value in kw.values()]
+        cls_args.extend(cls_kw)
+    return dispatch(tuple(cls_args))(*args, **kw)
+
+
+CALL_SHAPES = {
+    "f(1, 'a')": lambda call: call(1, "a"),
+    "f(1, b='a')": lambda call: call(1, b="a"),
+    "f(a=1, b='a')": lambda call: call(a=1, b="a"),
+}
+
+
+def main():
+    number = 200_000
+    for shape, make_call in CALL_SHAPES.items():
+        for name, call in (("generic", generic_call_path), ("generated", generic)):
+            best = min(timeit.repeat(lambda: make_call(call), number=number, repeat=5))
+            print(f"{shape:>14} {name:>10}: {best / number * 1e9:.0f}ns per call")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,15 @@
-from .main import DispatchWarning, multidispatch
+from .main import (
+    AmbiguityWarning,
+    AmbiguousDispatchError,
+    DispatchWarning,
+    multidispatch,
+    warm_all,
+)
 
-__all__ = ["multidispatch", "DispatchWarning"]
+__all__ = [
+    "multidispatch",
+    "DispatchWarning",
+    "AmbiguityWarning",
+    "AmbiguousDispatchError",
+    "warm_all",
+]
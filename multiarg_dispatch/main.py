@@ -1,9 +1,15 @@
 # type: ignore
 
 import inspect
+import itertools
+import pkgutil
 import types
 import warnings
-from functools import update_wrapper
+import weakref
+from abc import get_cache_token
+from collections import OrderedDict, deque, namedtuple
+from contextlib import contextmanager
+from functools import partial, update_wrapper
 from typing import Union, get_args, get_origin, get_type_hints
 
 
@@ -11,38 +17,908 @@ class DispatchWarning(UserWarning):
     """Warning raised when dispatching might be affected by defaults."""
 
 
+class AmbiguityWarning(DispatchWarning):
+    """Warning raised when registered signatures can match a call equally well."""
+
+
+class AmbiguousDispatchError(TypeError):
+    """Raised when several implementations match a call equally well."""
+
+
+CacheInfo = namedtuple(
+    "CacheInfo", ["hits", "misses", "evictions", "maxsize", "currsize"]
+)
+
+
+class _DispatchCache:
+    """LRU mapping of class tuples to resolved implementations or results.
+
+    Entries are keyed by the ids of the argument classes and each class is
+    tracked through a weak reference, so the cache never keeps a class alive:
+    when a class is garbage collected every entry mentioning it is dropped
+    before its id can be reused. A *maxsize* of None leaves the cache
+    unbounded, 0 disables caching.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        # id(cls) -> (weakref to cls, keys of the entries mentioning cls)
+        self.tracked = {}
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, cls):
+        key = tuple(map(id, cls))
+        try:
+            impl = self.data[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        if self.maxsize is not None:
+            self.data.move_to_end(key)
+        return impl
+
+    def set(self, cls, impl):
+        if self.maxsize == 0:
+            return
+        key = tuple(map(id, cls))
+        if key not in self.data:
+            for c in cls:
+                entry = self.tracked.get(id(c))
+                if entry is None:
+                    ref = weakref.ref(c, partial(self._collect, id(c)))
+                    entry = self.tracked[id(c)] = (ref, set())
+                entry[1].add(key)
+        self.data[key] = impl
+        if self.maxsize is not None and len(self.data) > self.maxsize:
+            self._discard(next(iter(self.data)))
+            self.evictions += 1
+
+    def _discard(self, key):
+        del self.data[key]
+        for i in key:
+            entry = self.tracked.get(i)
+            if entry is not None:
+                entry[1].discard(key)
+                if not entry[1]:
+                    del self.tracked[i]
+
+    def _collect(self, i, ref):
+        entry = self.tracked.pop(i, None)
+        if entry is not None:
+            for key in entry[1]:
+                if key in self.data:
+                    self._discard(key)
+
+    def classes(self, key):
+        """Class tuple of the entry *key*, with None for collected classes."""
+        entries = [self.tracked.get(i) for i in key]
+        return tuple([None if entry is None else entry[0]() for entry in entries])
+
+    def invalidate(self, matches):
+        """Drop the entries whose class tuple satisfies *matches*.
+
+        Runs in time linear in the size of the cache. *matches* may run
+        arbitrary code, including garbage collections dropping entries, so
+        the entries are iterated over a snapshot.
+        """
+        stale = []
+        for key in list(self.data):
+            if key not in self.data:
+                continue
+            cls = self.classes(key)
+            if None in cls or matches(cls):
+                stale.append(key)
+        for key in stale:
+            if key in self.data:
+                self._discard(key)
+        return len(stale)
+
+    def clear(self):
+        self.data.clear()
+        self.tracked.clear()
+
+    def info(self):
+        return CacheInfo(
+            self.hits, self.misses, self.evictions, self.maxsize, len(self.data)
+        )
+
+    def reset(self):
+        self.clear()
+        self.hits = self.misses = self.evictions = 0
+
+
 def _is_union_type(cls):
     return get_origin(cls) in {Union, types.UnionType}
 
 
+def _union_members(cls):
+    """Return the classes making up an annotation, expanding unions."""
+    return get_args(cls) if _is_union_type(cls) else (cls,)
+
+
+def _has_plain_subclasscheck(cls):
+    """Whether issubclass() against *cls* is decided by the MRO alone."""
+    return type(cls).__subclasscheck__ is type.__subclasscheck__
+
+
+class _CustomCheckClasses(tuple):
+    """Classes of a signature position, some with a custom __subclasscheck__."""
+
+
+def _expand(key):
+    """Expand a registered signature into a tuple of classes per position.
+
+    Resolution only works on expanded signatures, which can be passed to
+    issubclass() directly, so it never has to inspect annotations. Positions
+    with ABCs or protocols are marked as _CustomCheckClasses, as they cannot
+    be matched through the MRO.
+    """
+    members = []
+    for reg in key:
+        classes = _union_members(reg)
+        if all(map(_has_plain_subclasscheck, classes)):
+            members.append(tuple(classes))
+        else:
+            members.append(_CustomCheckClasses(classes))
+    return tuple(members)
+
+
+def _omitted_type_tuples(members, parameters):
+    """Type tuples of the calls omitting trailing defaulted *parameters*.
+
+    *members* is an expanded signature, unions result in one type tuple per
+    member combination.
+    """
+    n_required = len(members)
+    for param in reversed(parameters.values()):
+        if param.default is param.empty:
+            break
+        n_required -= 1
+    return [
+        type_tuple
+        for n_passed in range(max(n_required, 1), len(members))
+        for type_tuple in itertools.product(*members[:n_passed])
+    ]
+
+
+def _n_required(parameters):
+    """Number of positional *parameters* a call has to pass."""
+    return sum(
+        param.default is param.empty
+        and param.kind in (param.POSITIONAL_ONLY, param.POSITIONAL_OR_KEYWORD)
+        for param in parameters.values()
+    )
+
+
 def _is_valid_dispatch_type(cls):
     if isinstance(cls, type):
         return True
     return _is_union_type(cls) and all(isinstance(arg, type) for arg in get_args(cls))
 
 
-def _find_impl(arg_types: tuple, registry):
-    """Find the best matching implementation for a given set of argument types."""
-    for registered_types, func in registry.items():
-        # Skip the default implementation
-        if registered_types is object:
+def _distance(arg, classes):
+    """Distance from class *arg* to the closest of *classes* along its MRO.
+
+    Virtual subclasses (ABCs) rank after every real base class, and object
+    ranks last.
+    """
+    mro = arg.__mro__
+    distances = []
+    for c in classes:
+        if c is object:
+            distances.append(len(mro))
+        elif c in mro:
+            distances.append(mro.index(c))
+        else:
+            distances.append(len(mro) - 1)
+    return min(distances)
+
+
+def _dominates(members, other):
+    """Whether expanded signature *members* accepts a subset of *other*."""
+    return all(
+        all(issubclass(c, classes_other) for c in classes)
+        for classes, classes_other in zip(members, other)
+    )
+
+
+def _ties_at_meet(members, other):
+    """Most specific common calls that *members* and *other* match equally well.
+
+    The common calls take, at every position, the more specific of two
+    comparable classes of the signatures. Without multiple inheritance,
+    signatures with incomparable classes at some position never match the
+    same call. Returns (call, summed distance) pairs.
+    """
+    meets = []
+    for classes, classes_other in zip(members, other):
+        meet = [
+            c if issubclass(c, o) else o
+            for c in classes
+            for o in classes_other
+            if issubclass(c, o) or issubclass(o, c)
+        ]
+        if not meet:
+            return []
+        meets.append(meet)
+    ties = []
+    for call in itertools.product(*meets):
+        distance = sum(map(_distance, call, members))
+        if distance == sum(map(_distance, call, other)):
+            ties.append((call, distance))
+    return ties
+
+
+def _most_specific(arg_types, candidates, signatures, dominance):
+    """Pick the most specific of the signatures *candidates* matching a call.
+
+    *signatures* maps every signature to its expanded form and *dominance*
+    to the signatures it strictly dominates.
+    The candidate dominating the most signatures wins outright if it
+    dominates all other candidates. Otherwise signatures are ranked by their
+    summed MRO distance to *arg_types*, ties are broken in favour of a
+    signature dominating the other tied ones and raise
+    AmbiguousDispatchError otherwise.
+    """
+    if len(candidates) == 1:
+        return candidates[0]
+    top = max(candidates, key=lambda key: len(dominance[key]))
+    if all(key is top or key in dominance[top] for key in candidates):
+        return top
+    distances = {
+        key: sum(map(_distance, arg_types, signatures[key])) for key in candidates
+    }
+    best = min(distances.values())
+    tied = [key for key in candidates if distances[key] == best]
+    if len(tied) > 1:
+        tied = [
+            key for key in tied if not any(key in dominance[other] for other in tied)
+        ]
+    if len(tied) > 1:
+        raise AmbiguousDispatchError(
+            f"Ambiguous dispatch for argument types {arg_types}: "
+            f"{', '.join(map(str, tied))} match equally well."
+        )
+    return tied[0]
+
+
+class _RelatedSignatures:
+    """Index of signatures by the classes they accept at every position.
+
+    Two signatures can only dominate one another or tie at a common call if
+    their classes are comparable at every position, so analysing a new
+    signature only needs the signatures related to it through the MRO at
+    every position. A position accepting classes with a custom issubclass()
+    relates to every signature. Candidates are taken from the most selective
+    position and checked against the others.
+    """
+
+    def __init__(self):
+        self.keys = set()
+        # Per position: class -> signatures accepting it there
+        self.by_class = []
+        # Per position: class -> signatures accepting a subclass of it there
+        self.by_base = []
+        # Per position: signatures accepting classes with a custom issubclass()
+        self.unindexed = []
+        # Signatures with such classes at any position
+        self.abstract = set()
+
+    def add(self, key, members):
+        self.keys.add(key)
+        for i, classes in enumerate(members):
+            if i == len(self.by_class):
+                self.by_class.append({})
+                self.by_base.append({})
+                self.unindexed.append(set())
+            if isinstance(classes, _CustomCheckClasses):
+                self.unindexed[i].add(key)
+                self.abstract.add(key)
+                continue
+            for c in classes:
+                self.by_class[i].setdefault(c, set()).add(key)
+                for base in c.__mro__:
+                    self.by_base[i].setdefault(base, set()).add(key)
+
+    def related(self, members):
+        positions = []
+        for i, classes in enumerate(members):
+            if isinstance(classes, _CustomCheckClasses) or i == len(self.by_class):
+                continue
+            groups = [self.unindexed[i]]
+            for c in classes:
+                groups.append(self.by_base[i].get(c, ()))
+                groups.extend(self.by_class[i].get(base, ()) for base in c.__mro__)
+            positions.append(groups)
+        if not positions:
+            return self.keys
+        positions.sort(key=lambda groups: sum(map(len, groups)))
+        related = set().union(*positions[0])
+        for groups in positions[1:]:
+            related = {key for key in related if any(key in g for g in groups)}
+        return related
+
+
+def _find_matches(arg_types: tuple, signatures):
+    """Find the registered signatures matching a given set of argument types."""
+    return [
+        key
+        for key, members in signatures.items()
+        # Unions are expanded into tuples of classes, see _expand()
+        if all(map(issubclass, arg_types, members))
+    ]
+
+
+class _ScanEngine:
+    """Find candidates by testing every registered signature with _find_matches."""
+
+    def __init__(self, signatures):
+        self.signatures = signatures
+
+    def add(self, key):
+        pass
+
+    def find(self, arg_types):
+        return _find_matches(arg_types, self.signatures)
+
+
+class _IndexEngine:
+    """Find candidates through a per-position index of the registered signatures.
+
+    For every argument position the signatures are indexed by the classes
+    they accept there. A lookup walks the MRO of each argument class,
+    collects the signatures accepting it and intersects these sets across
+    positions, so its cost depends on the arity and the depth of the class
+    hierarchies instead of on the number of registrations. Classes whose
+    metaclass customizes issubclass() (ABCs, protocols) cannot be found
+    through the MRO and are tested with issubclass() instead, which ABCMeta
+    caches itself.
+    """
+
+    def __init__(self, signatures):
+        self.signatures = signatures
+        # Signature -> registration index, for a deterministic candidate order
+        self.order = {}
+        # Per position: {cls: set of signatures accepting cls}
+        self.by_class = []
+        self.by_abstract_class = []
+        for key in signatures:
+            self.add(key)
+
+    def add(self, key):
+        if key in self.order:
+            return
+        self.order[key] = len(self.order)
+        for i, classes in enumerate(self.signatures[key]):
+            if i == len(self.by_class):
+                self.by_class.append({})
+                self.by_abstract_class.append({})
+            for c in classes:
+                if _has_plain_subclasscheck(c):
+                    table = self.by_class[i]
+                else:
+                    table = self.by_abstract_class[i]
+                table.setdefault(c, set()).add(key)
+
+    def find(self, arg_types):
+        candidates = None
+        for arg, by_class, by_abstract_class in zip(
+            arg_types, self.by_class, self.by_abstract_class
+        ):
+            accepting = set()
+            for c in arg.__mro__:
+                keys = by_class.get(c)
+                if keys:
+                    accepting |= keys
+            for c, keys in by_abstract_class.items():
+                if issubclass(arg, c):
+                    accepting |= keys
+            candidates = accepting if candidates is None else candidates & accepting
+            if not candidates:
+                return []
+        if candidates is None:
+            candidates = self.order
+        return sorted(candidates, key=self.order.__getitem__)
+
+
+class _BitsetEngine:
+    """Find candidates by intersecting per-position bitmasks of signatures.
+
+    Every registered signature gets a bit, and for every position each
+    accepted class maps to the mask of signatures accepting it. A lookup ORs
+    the masks found along the MRO of each argument class and ANDs the
+    results across positions, the surviving bits are the candidates.
+    """
+
+    def __init__(self, signatures):
+        self.signatures = signatures
+        self.keys = []
+        self.bits = {}
+        # Per position: {cls: mask of signatures accepting cls}
+        self.by_class = []
+        self.by_abstract_class = []
+        for key in signatures:
+            self.add(key)
+
+    def add(self, key):
+        if key in self.bits:
+            return
+        bit = self.bits[key] = 1 << len(self.keys)
+        self.keys.append(key)
+        for i, classes in enumerate(self.signatures[key]):
+            if i == len(self.by_class):
+                self.by_class.append({})
+                self.by_abstract_class.append({})
+            for c in classes:
+                if _has_plain_subclasscheck(c):
+                    table = self.by_class[i]
+                else:
+                    table = self.by_abstract_class[i]
+                table[c] = table.get(c, 0) | bit
+
+    def find(self, arg_types):
+        mask = (1 << len(self.keys)) - 1
+        for arg, by_class, by_abstract_class in zip(
+            arg_types, self.by_class, self.by_abstract_class
+        ):
+            accepting = 0
+            for c in arg.__mro__:
+                accepting |= by_class.get(c, 0)
+            for c, bits in by_abstract_class.items():
+                if issubclass(arg, c):
+                    accepting |= bits
+            mask &= accepting
+        candidates = []
+        while mask:
+            bit = mask & -mask
+            candidates.append(self.keys[bit.bit_length() - 1])
+            mask ^= bit
+        return candidates
+
+
+class _TreeNode:
+    __slots__ = ("position", "by_class", "by_abstract_class", "keys", "checks")
+
+    def __init__(self):
+        self.position = None
+        self.by_class = {}
+        self.by_abstract_class = {}
+        # Leaves only: candidate signatures and the positions left to verify
+        self.keys = ()
+        self.checks = ()
+
+
+class _TreeEngine:
+    """Find candidates through a decision tree compiled from the registry.
+
+    Each node branches on one argument position, chosen as the position with
+    the most distinct classes among the remaining signatures, with one edge
+    per accepted class. A lookup follows the edges found along the MRO of the
+    argument class, so it only visits the subtrees that can match. Leaves
+    holding a single signature verify the positions not branched on yet. The
+    tree is rebuilt lazily on the first lookup after a registration.
+    """
+
+    def __init__(self, signatures):
+        self.signatures = signatures
+        self.order = {}
+        self.root = None
+        for key in signatures:
+            self.add(key)
+
+    def add(self, key):
+        if key not in self.order:
+            self.order[key] = len(self.order)
+        self.root = None
+
+    def _build(self, keys, positions):
+        node = _TreeNode()
+        if len(keys) <= 1 or not positions:
+            node.keys = keys
+            node.checks = positions
+            return node
+        node.position = max(
+            positions,
+            key=lambda p: len({c for key in keys for c in self.signatures[key][p]}),
+        )
+        branches = {}
+        for key in keys:
+            for c in self.signatures[key][node.position]:
+                branches.setdefault(c, []).append(key)
+        remaining = tuple(p for p in positions if p != node.position)
+        for c, branch in branches.items():
+            if _has_plain_subclasscheck(c):
+                table = node.by_class
+            else:
+                table = node.by_abstract_class
+            table[c] = self._build(branch, remaining)
+        return node
+
+    def prepare(self):
+        """Compile the tree ahead of the next lookup."""
+        self._tree()
+
+    def _tree(self):
+        if self.root is None:
+            keys = list(self.order)
+            self.root = self._build(keys, tuple(range(max(map(len, keys), default=0))))
+        return self.root
+
+    def _collect(self, node, arg_types, found):
+        if node.position is None:
+            for key in node.keys:
+                if all(
+                    issubclass(arg_types[p], self.signatures[key][p])
+                    for p in node.checks
+                    if p < len(arg_types)
+                ):
+                    found.add(key)
+            return
+        if node.position >= len(arg_types):
+            children = [*node.by_class.values(), *node.by_abstract_class.values()]
+        else:
+            arg = arg_types[node.position]
+            children = [node.by_class[c] for c in arg.__mro__ if c in node.by_class]
+            children.extend(
+                child
+                for c, child in node.by_abstract_class.items()
+                if issubclass(arg, c)
+            )
+        for child in children:
+            self._collect(child, arg_types, found)
+
+    def find(self, arg_types):
+        found = set()
+        self._collect(self._tree(), arg_types, found)
+        return sorted(found, key=self.order.__getitem__)
+
+    @property
+    def depth(self):
+        """Number of branching levels on the longest path of the tree."""
+
+        def depth(node):
+            children = [*node.by_class.values(), *node.by_abstract_class.values()]
+            return 1 + max(map(depth, children)) if children else 0
+
+        return depth(self._tree())
+
+    @property
+    def node_count(self):
+        """Number of nodes in the tree, leaves included."""
+
+        def count(node):
+            children = [*node.by_class.values(), *node.by_abstract_class.values()]
+            return 1 + sum(map(count, children))
+
+        return count(self._tree())
+
+
+class _MROEngine:
+    """Find candidates by walking the MRO of the most discriminating argument.
+
+    Like functools.singledispatch, the signatures are looked up in a dict
+    keyed by the classes they accept at a single pivot position, the
+    position with the most distinct registered classes. A lookup walks the
+    MRO of the argument class at that position and only tests the other
+    positions of the signatures found there, so its cost depends on the
+    depth of the class hierarchy rather than on the number of registrations.
+    """
+
+    def __init__(self, signatures):
+        self.signatures = signatures
+        self.order = {}
+        # Per position: {cls: signatures accepting cls, in registration order}
+        self.by_class = []
+        self.by_abstract_class = []
+        self.pivot = 0
+        # Signature -> (position, classes) for every position but the pivot
+        # and positions accepting object
+        self.checks = {}
+        for key in signatures:
+            self.add(key)
+
+    def _checks(self, key):
+        return [
+            (i, classes)
+            for i, classes in enumerate(self.signatures[key])
+            if i != self.pivot and object not in classes
+        ]
+
+    def add(self, key):
+        if key in self.order:
+            return
+        self.order[key] = len(self.order)
+        for i, classes in enumerate(self.signatures[key]):
+            if i == len(self.by_class):
+                self.by_class.append({})
+                self.by_abstract_class.append({})
+            for c in classes:
+                if _has_plain_subclasscheck(c):
+                    table = self.by_class[i]
+                else:
+                    table = self.by_abstract_class[i]
+                table.setdefault(c, []).append(key)
+        pivot = max(
+            range(len(self.by_class)),
+            key=lambda i: len(self.by_class[i]) + len(self.by_abstract_class[i]),
+        )
+        if pivot != self.pivot:
+            self.pivot = pivot
+            self.checks = {other: self._checks(other) for other in self.order}
+        else:
+            self.checks[key] = self._checks(key)
+
+    def find(self, arg_types):
+        n_args = len(arg_types)
+        if self.pivot >= min(n_args, len(self.by_class)):
+            return _find_matches(arg_types, self.signatures)
+        arg = arg_types[self.pivot]
+        found = set()
+        for c in arg.__mro__:
+            keys = self.by_class[self.pivot].get(c)
+            if keys:
+                found.update(keys)
+        for c, keys in self.by_abstract_class[self.pivot].items():
+            if issubclass(arg, c):
+                found.update(keys)
+        # The MRO walk matched the pivot already, only check the others
+        matches = []
+        for key in sorted(found, key=self.order.__getitem__):
+            for i, classes in self.checks[key]:
+                if i < n_args and not issubclass(arg_types[i], classes):
+                    break
+            else:
+                matches.append(key)
+        return matches
+
+
+_ENGINES = {
+    "scan": _ScanEngine,
+    "index": _IndexEngine,
+    "bitset": _BitsetEngine,
+    "tree": _TreeEngine,
+    "mro": _MROEngine,
+}
+
+# Adaptive engine selection: registries up to this many signatures are
+# scanned, larger ones are indexed
+_SCAN_MAX_SIGNATURES = 8
+# A scanned function is indexed once at least this many cache misses were
+# observed and they make up more than half of its lookups
+_ADAPTIVE_MIN_MISSES = 64
+
+
+_MISSING = object()
+
+_FIXED_ARITY_WRAPPER = """\
+def wrapper({parameters}, *args, **kw):
+    if {missing} or args or kw:
+        return call_slots(({names},), args, kw)
+    return dispatch(({classes},))({names})
+"""
+
+
+def _call_slots(names, call_generic, values, args, kw):
+    """Forward a call that left slots of a generated wrapper empty.
+
+    The slots up to the first empty one are passed positionally and later
+    ones by name, so *call_generic* sees the call as it was made.
+    """
+    positional = []
+    keywords = {}
+    gap = False
+    for name, value in zip(names, values):
+        if value is _MISSING:
+            gap = True
+        elif gap:
+            keywords[name] = value
+        else:
+            positional.append(value)
+    return call_generic(*positional, *args, **keywords, **kw)
+
+
+def _make_fixed_arity_wrapper(parameters, dispatch, call_generic):
+    """Generate the calling wrapper for the *parameters* of the default.
+
+    The wrapper has a slot per parameter, named after it so keyword arguments
+    bind to it like positional ones. Calls filling exactly every slot build
+    the type tuple directly and call the implementation positionally, any
+    other call shape is forwarded to *call_generic*. Parameters that cannot
+    be passed both ways, or whose names clash with the wrapper's, make every
+    slot positional-only.
+    """
+    kinds = [param.kind for param in parameters.values()]
+    names = [
+        f"a{i}" if kind is inspect.Parameter.POSITIONAL_ONLY else name
+        for i, (name, kind) in enumerate(zip(parameters, kinds))
+    ]
+    reserved = {"_MISSING", "dispatch", "call_slots", "args", "kw"}
+    if (
+        inspect.Parameter.POSITIONAL_OR_KEYWORD in kinds
+        and all(
+            kind
+            in (
+                inspect.Parameter.POSITIONAL_ONLY,
+                inspect.Parameter.POSITIONAL_OR_KEYWORD,
+            )
+            for kind in kinds
+        )
+        and not reserved.intersection(names)
+        and len(set(names)) == len(names)
+    ):
+        n_positional_only = kinds.count(inspect.Parameter.POSITIONAL_ONLY)
+    else:
+        names = [f"a{i}" for i in range(len(kinds))]
+        n_positional_only = len(names)
+    slots = [f"{name}=_MISSING" for name in names]
+    if n_positional_only:
+        slots.insert(n_positional_only, "/")
+    # Positional-only slots are filled in order, so only the last of them
+    # and every keyword slot can be empty independently
+    source = _FIXED_ARITY_WRAPPER.format(
+        parameters=", ".join(slots),
+        missing=" or ".join(
+            f"{name} is _MISSING" for name in names[max(n_positional_only - 1, 0) :]
+        ),
+        names=", ".join(names),
+        classes=", ".join(f"{name}.__class__" for name in names),
+    )
+    namespace = {
+        "_MISSING": _MISSING,
+        "dispatch": dispatch,
+        "call_slots": partial(_call_slots, tuple(names), call_generic),
+    }
+    exec(source, namespace)
+    return namespace["wrapper"]
+
+
+class _DispatchRecorder:
+    """Append the distinct argument-type tuples resolved by a generic function.
+
+    Every line of the file holds one type tuple as comma-separated
+    ``module:qualname`` class names. Classes that cannot be imported by name
+    (local classes) are not recorded.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.seen = set()
+
+    def record(self, cls):
+        names = [f"{c.__module__}:{c.__qualname__}" for c in cls]
+        line = ",".join(names)
+        if line in self.seen or "<locals>" in line:
+            return
+        self.seen.add(line)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+def _read_type_tuples(path):
+    """Yield the type tuples recorded in *path* by _DispatchRecorder.
+
+    Lines naming classes that cannot be imported anymore are skipped, and so
+    is a missing file.
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            lines = set(f.read().splitlines())
+    except FileNotFoundError:
+        return
+    for line in sorted(lines):
+        try:
+            cls = tuple(map(pkgutil.resolve_name, line.split(",")))
+        except (ImportError, AttributeError, ValueError):
             continue
-        match = True
-        # Check each argument type against the registered types
-        for arg, reg in zip(arg_types, registered_types):
-            # Handle Union types in the registry
-            if _is_union_type(reg):
-                if not any(issubclass(arg, r) for r in get_args(reg)):
-                    match = False
-            # Handle regular types
-            if not issubclass(arg, reg):
-                match = False
-        if match:
-            return func
-    return registry.get(object)
+        if all(isinstance(c, type) for c in cls):
+            yield cls
+
+
+# Every generic function of the process, see warm_all()
+_generic_functions = weakref.WeakSet()
+
+
+def warm_all():
+    """Warm every generic function of the process, see generic_func.warm()."""
+    for generic_func in list(_generic_functions):
+        generic_func.warm()
+
+
+class Specialization:
+    """Implementation of a generic function resolved for fixed argument types.
+
+    Returned by generic_func.specialize(*types). Calling it calls *impl*
+    directly, after checking that no registration since changed the
+    implementation *types* resolve to, in which case it raises RuntimeError.
+    *guard* cheaply tells whether arguments have exactly the specialized
+    types.
+    """
+
+    __slots__ = ("types", "impl", "_dispatch", "_generation", "_current_generation")
+
+    def __init__(self, types, dispatch, current_generation):
+        self.types = types
+        self._dispatch = dispatch
+        self._current_generation = current_generation
+        self._generation = current_generation()
+        self.impl = dispatch(types)
+
+    @property
+    def valid(self):
+        """Whether *types* still resolve to *impl*."""
+        if self._generation != self._current_generation():
+            if self._dispatch(self.types) is not self.impl:
+                return False
+            self._generation = self._current_generation()
+        return True
 
+    def guard(self, *args):
+        """Whether *args* have exactly the specialized types."""
+        return len(args) == len(self.types) and all(
+            arg.__class__ is cls for arg, cls in zip(args, self.types)
+        )
 
-def multidispatch(func):
+    def __call__(self, *args, **kw):
+        if self._generation != self._current_generation() and not self.valid:
+            raise RuntimeError(
+                f"A registration changed the implementation for {self.types}, "
+                f"specialize again."
+            )
+        return self.impl(*args, **kw)
+
+    def __repr__(self):
+        return f"<Specialization of {self.impl!r} for {self.types}>"
+
+
+class CallSite:
+    """Inline cache for a single call site of a generic function.
+
+    Returned by generic_func.callsite(size). Calling it remembers the
+    implementations of the last *size* argument-type tuples passed
+    positionally, so a monomorphic (size 1) or polymorphic call site skips
+    the dispatch cache entirely. Misses and keyword calls go through the
+    generic function, and the entries are dropped whenever a registration
+    may have changed resolutions. The entries hold the argument classes
+    strongly.
+    """
+
+    __slots__ = (
+        "size",
+        "entries",
+        "_generic_func",
+        "_dispatch",
+        "_generation",
+        "_current_generation",
+    )
+
+    def __init__(self, generic_func, dispatch, current_generation, size):
+        self.size = size
+        self.entries = {}
+        self._generic_func = generic_func
+        self._dispatch = dispatch
+        self._current_generation = current_generation
+        self._generation = current_generation()
+
+    def __call__(self, *args, **kw):
+        if kw or not args:
+            return self._generic_func(*args, **kw)
+        generation = self._current_generation()
+        if generation != self._generation:
+            self.entries.clear()
+            self._generation = generation
+        cls = tuple([arg.__class__ for arg in args])
+        impl = self.entries.get(cls)
+        if impl is None:
+            impl = self._dispatch(cls)
+            if len(self.entries) >= self.size:
+                del self.entries[next(iter(self.entries))]
+            self.entries[cls] = impl
+        return impl(*args)
+
+
+def multidispatch(func=None, *, maxsize=128, engine="auto", defaults=False, lazy=False):
     """Multi-dispatch generic function decorator.
 
     Transforms a function into a generic function, which can have different
@@ -50,10 +926,87 @@ def multidispatch(func):
     function acts as the default implementation, and additional
     implementations can be registered using the register() attribute of the
     generic function.
+
+    Resolved implementations are kept in an LRU cache of at most *maxsize*
+    argument-type tuples (None for unbounded). Cache misses are resolved by
+    *engine*: "index" looks candidates up in a per-position index built at
+    registration, "bitset" intersects per-position bitmasks of compatible
+    signatures, "tree" walks a decision tree compiled from the registry,
+    "mro" walks the MRO of the argument at the most discriminating position
+    and "scan" tests every registered signature in turn. The default "auto"
+    picks a strategy from the size of the registry and the observed cache
+    miss rate, and reports it through the strategy attribute.
+
+    With *defaults*, calls omitting trailing arguments that an implementation
+    declares defaults for resolve to that implementation through a direct
+    lookup, and registering implementations with defaults does not warn.
+
+    With *lazy*, the type hints of registered implementations are only
+    evaluated on the first call of the generic function or on finalize(), so
+    importing modules stays cheap and annotations can refer to classes
+    defined after the registration. Use as ``@multidispatch`` or
+    ``@multidispatch(maxsize=..., engine=...)``.
     """
+    if func is None:
+        return partial(
+            multidispatch,
+            maxsize=maxsize,
+            engine=engine,
+            defaults=defaults,
+            lazy=lazy,
+        )
+    if engine != "auto" and engine not in _ENGINES:
+        raise ValueError(
+            f"Unknown dispatch engine {engine!r}. "
+            f"Expected 'auto' or one of {list(_ENGINES)}."
+        )
+
     registry = {}
+    # Registered signatures (all but the default) in their expanded form, see
+    # _expand(). Resolution reads these instead of the annotations.
+    signatures = {}
+    adaptive = engine == "auto"
+    # Active strategy: "exact" resolves through the registry alone, any other
+    # strategy names the engine resolving cache misses
+    strategy = None
+    resolver = None
+    # Adaptive selection never goes back to scanning once it indexed
+    indexed = False
+    # Resolved implementations keyed by the concrete argument-type tuple
+    dispatch_cache = _DispatchCache(maxsize)
+    # ABC registrations can change issubclass() results, see dispatch()
+    cache_token = None
+    # Bumped whenever resolutions may have changed, see specialize()
+    generation = 0
+    # Registrations deferred by bulk_register(), None outside of it
+    pending = None
+    # With *lazy*: (implementation, explicit types or None) registered but
+    # not evaluated yet, in registration order
+    deferred = deque()
+    # Set by record()
+    recorder = None
+    # With *defaults*: type tuples of calls omitting defaulted arguments,
+    # mapped to the signatures accepting them. Only type tuples accepted by a
+    # single signature resolve directly through *omissions*.
+    omission_owners = {}
+    omitted_by = {}
+    omissions = {}
+    # Signature -> number of arguments its implementation requires, calls
+    # passing fewer cannot resolve to it
+    required = {}
+    # Signature -> signatures it strictly dominates, see analyse()
+    dominance = {}
+    related = _RelatedSignatures()
     # Save default number of arguments for validation during registration
-    n_arguments = len(inspect.signature(func).parameters)
+    parameters = inspect.signature(func).parameters
+    n_arguments = len(parameters)
+    # Positions of the parameters that can be passed by keyword, so keyword
+    # arguments fill the same type slots as positional ones
+    keyword_positions = {
+        name: i
+        for i, (name, param) in enumerate(parameters.items())
+        if param.kind in (param.POSITIONAL_OR_KEYWORD, param.KEYWORD_ONLY)
+    }
 
     def dispatch(cls):
         """generic_func.dispatch(cls) -> <function implementation>
@@ -61,50 +1014,222 @@ def multidispatch(func):
         Runs the dispatch algorithm to return the best available implementation
         for the given *cls* registered on *generic_func*.
         """
-        try:
-            impl = registry[cls]
-        except KeyError:
-            impl = _find_impl(cls, registry)
+        nonlocal recorder
+        if resolver is None and not deferred:
+            # Nothing but the default is registered
+            return registry[object]
+        if cache_token is not None and cache_token != get_cache_token():
+            refresh_cache_token()
+        impl = dispatch_cache.get(cls)
+        if impl is None:
+            if deferred:
+                finalize()
+            # Fallbacks to the default implementation are cached as well, so
+            # unknown type tuples only pay the scan once
+            impl = registry.get(cls) or omissions.get(cls)
+            if impl is None:
+                if adaptive and not indexed:
+                    adapt_to_misses()
+                candidates = resolver.find(cls)
+                if len(cls) < n_arguments:
+                    # Calls omitting arguments prefer the implementations
+                    # declaring defaults for them, lookups by a prefix of
+                    # the classes fall back to every matching signature
+                    accepting = [key for key in candidates if required[key] <= len(cls)]
+                    candidates = accepting or candidates
+                if candidates:
+                    impl = registry[
+                        _most_specific(cls, candidates, signatures, dominance)
+                    ]
+                else:
+                    impl = registry[object]
+            if recorder is not None:
+                try:
+                    recorder.record(cls)
+                except OSError as exc:
+                    # Recording must not break calls of the generic function
+                    recorder = None
+                    warnings.warn(
+                        f"Stopped recording type tuples of {funcname!r}: {exc}",
+                        category=DispatchWarning,
+                    )
+            dispatch_cache.set(cls, impl)
         return impl
 
-    def register(func=None):
+    def refresh_cache_token():
+        """Drop resolutions that virtual subclass registrations may change."""
+        nonlocal cache_token, generation
+        dispatch_cache.clear()
+        generation += 1
+        cache_token = get_cache_token()
+        # Virtual subclasses can only change the order between signatures
+        # accepting ABCs or protocols somewhere, analyse those again
+        abstract = related.abstract
+        for key in abstract:
+            dominance.pop(key, None)
+        for dominated in dominance.values():
+            dominated -= abstract
+        for key in abstract:
+            analyse(key, warn=False)
+
+    def current_generation():
+        """Registration generation, bumped by ABC registrations as well."""
+        if cache_token is not None and cache_token != get_cache_token():
+            refresh_cache_token()
+        return generation
+
+    def analyse(key, warn=True):
+        """Record the dominance between *key* and the analysed signatures.
+
+        Signatures that neither strictly dominates the other and that match
+        their most specific common call equally well raise AmbiguityWarning.
+        """
+        if key in dominance:
+            return
+        dominance[key] = set()
+        related.add(key, signatures[key])
+        for other in related.related(signatures[key]):
+            if other is key or other not in dominance:
+                continue
+            key_dominates = _dominates(signatures[key], signatures[other])
+            other_dominates = _dominates(signatures[other], signatures[key])
+            if key_dominates and not other_dominates:
+                dominance[key].add(other)
+            elif other_dominates and not key_dominates:
+                dominance[other].add(key)
+            elif warn and any(
+                not resolved_closer(call, distance)
+                for call, distance in _ties_at_meet(signatures[key], signatures[other])
+            ):
+                warnings.warn(
+                    f"Signatures {key} and {other} of {funcname!r} can match "
+                    f"a call equally well.",
+                    category=AmbiguityWarning,
+                )
+
+    def resolved_closer(call, distance):
+        """Whether a signature matches *call* closer than *distance*."""
+        return any(
+            all(map(issubclass, call, members))
+            and sum(map(_distance, call, members)) < distance
+            for members in signatures.values()
+        )
+
+    def set_strategy(name):
+        nonlocal strategy, resolver
+        if name != strategy:
+            strategy = name
+            resolver = None if name == "exact" else _ENGINES[name](signatures)
+            wrapper.strategy = strategy
+            wrapper.engine = resolver
+
+    def adapt_to_registry():
+        n_signatures = len(signatures)
+        if n_signatures == 0:
+            set_strategy("exact")
+        elif n_signatures <= _SCAN_MAX_SIGNATURES and not indexed:
+            set_strategy("scan")
+        else:
+            adapt_to_index()
+
+    def adapt_to_misses():
+        hits, misses = dispatch_cache.hits, dispatch_cache.misses
+        if misses >= _ADAPTIVE_MIN_MISSES and 2 * misses > hits + misses:
+            adapt_to_index()
+
+    def adapt_to_index():
+        nonlocal indexed
+        indexed = True
+        set_strategy("index")
+
+    def register(func=None, *cls, types=None):
         """generic_func.register(func) -> func
+        generic_func.register(*cls)(func) -> func
+        generic_func.register(func, types=cls) -> func
 
         Registers a new implementation for the given *cls* on a *generic_func*.
+        Without explicit classes they are taken from the type hints of *func*.
         """
-
-        # Extract type hints
-        type_hints = get_type_hints(func)
-        arg_type_hints = {k: v for k, v in type_hints.items() if k != "return"}
-        # Validate type hints to make sure all arguments are annotated
-        sig = inspect.signature(func)
-        if len(arg_type_hints) != len(sig.parameters):
+        if types is None and _is_valid_dispatch_type(func):
+            # Classes given positionally, *func* itself may be a class (e.g.
+            # a builtin type) when they are passed as *types*
+            return lambda impl: register(impl, types=(func, *cls))
+        if cls:
             raise TypeError(
-                f"All arguments must be type-annotated for {funcname!r}. "
-                f"Got {len(arg_type_hints)} annotations for {len(sig.parameters)} parameters."
+                f"Invalid first argument to register(): {func!r} is not a class."
+                if types is None
+                else "Pass the classes either positionally or as types, not both."
             )
-        # Warn if any parameters have default values
-        for name, param in sig.parameters.items():
-            if param.default is not inspect._empty:
-                warnings.warn(
-                    f"Parameter '{name}' has a default value ({param.default}).\n "
-                    f"Note that default values are not considered in dispatching when calling the function.",
-                    category=DispatchWarning,
+        if lazy and (types is None or deferred):
+            # Explicit types queue behind pending lazy registrations, so
+            # later registrations still win
+            deferred.append((func, types))
+            # Cached resolutions may change once the hints are evaluated
+            dispatch_cache.clear()
+            nonlocal generation
+            generation += 1
+            return func
+        registration = validate(func, types)
+        if pending is not None:
+            pending.append(registration)
+        else:
+            commit([registration])
+        return func
+
+    def validate(func, types):
+        """Check *func* and its classes, returning them as a registration."""
+        if types is None:
+            # Extract type hints
+            type_hints = get_type_hints(func)
+            arg_type_hints = {k: v for k, v in type_hints.items() if k != "return"}
+            # Validate type hints to make sure all arguments are annotated
+            sig = inspect.signature(func)
+            if len(arg_type_hints) != len(sig.parameters):
+                raise TypeError(
+                    f"All arguments must be type-annotated for {funcname!r}. "
+                    f"Got {len(arg_type_hints)} annotations for {len(sig.parameters)} parameters."
                 )
-        # Validate that all type hints are valid dispatch types
-        for argname, cls in arg_type_hints.items():
-            if not _is_valid_dispatch_type(cls):
-                if _is_union_type(cls):
-                    raise TypeError(
-                        f"Invalid annotation for {argname!r}. "
-                        f"{cls!r} not all arguments are classes."
-                    )
-                else:
+            # Warn if any parameters have default values, unless defaults are
+            # taken into account
+            if not defaults:
+                for name, param in sig.parameters.items():
+                    if param.default is not inspect._empty:
+                        warnings.warn(
+                            f"Parameter '{name}' has a default value ({param.default}).\n "
+                            f"Note that default values are not considered in dispatching when calling the function.",
+                            category=DispatchWarning,
+                        )
+            # Validate that all type hints are valid dispatch types
+            for argname, cls in arg_type_hints.items():
+                if not _is_valid_dispatch_type(cls):
+                    if _is_union_type(cls):
+                        raise TypeError(
+                            f"Invalid annotation for {argname!r}. "
+                            f"{cls!r} not all arguments are classes."
+                        )
+                    else:
+                        raise TypeError(
+                            f"Invalid annotation for {argname!r}. {cls!r} is not a class."
+                        )
+
+            clss = [cls for _, cls in arg_type_hints.items()]
+            parameters = sig.parameters
+        else:
+            # Explicit classes skip annotation evaluation, which also allows
+            # registering builtins and other callables without hints
+            for c in types:
+                if not _is_valid_dispatch_type(c):
                     raise TypeError(
-                        f"Invalid annotation for {argname!r}. {cls!r} is not a class."
+                        f"Invalid type {c!r} for {funcname!r}. "
+                        f"Expected a class or a union of classes."
                     )
-
-        clss = [cls for _, cls in arg_type_hints.items()]
+            clss = list(types)
+            try:
+                parameters = inspect.signature(func).parameters
+            except (TypeError, ValueError):
+                # No signature available, the implementation is assumed to
+                # require every argument and gets no omissions
+                parameters = None
 
         if n_arguments != len(clss):
             raise TypeError(
@@ -112,25 +1237,220 @@ def multidispatch(func):
                 f"Expected {n_arguments} types."
             )
 
-        registry[tuple(clss)] = func
+        key = tuple(clss)
+        members = _expand(key)
 
-        return func
+        nonlocal cache_token
+        if cache_token is None and any(
+            hasattr(c, "__abstractmethods__") for classes in members for c in classes
+        ):
+            cache_token = get_cache_token()
+
+        if parameters is None:
+            omitted, n_required = (), len(clss)
+        else:
+            omitted = _omitted_type_tuples(members, parameters) if defaults else ()
+            n_required = _n_required(parameters)
+        return key, func, members, omitted, n_required
+
+    def finalize():
+        """generic_func.finalize()
+
+        Evaluates the type hints of the implementations registered lazily
+        and registers them in one batch, raising for invalid annotations.
+        Called on the first dispatch that misses the cache.
+        """
+        registrations = []
+        try:
+            while deferred:
+                func, types = deferred.popleft()
+                try:
+                    registrations.append(validate(func, types))
+                except Exception:
+                    # Retried on the next call, e.g. once a forward
+                    # reference can be resolved
+                    deferred.appendleft((func, types))
+                    raise
+        finally:
+            if registrations:
+                commit(registrations)
+
+    def commit(registrations):
+        """Add validated registrations to the registry, engine and cache."""
+        for key, func, members, omitted, n_required in registrations:
+            registry[key] = func
+            signatures[key] = members
+            required[key] = n_required
+            analyse(key)
+            if defaults:
+                update_omissions(key, omitted)
+        if adaptive:
+            adapt_to_registry()
+        if resolver is not None:
+            for key, *_ in registrations:
+                resolver.add(key)
+        # Only the type tuples the new signatures match can resolve
+        # differently now, every other entry stays warm. Shorter tuples are
+        # matched against a prefix, which covers omitted defaults too.
+        added = _IndexEngine({key: members for key, _, members, *_ in registrations})
+        dispatch_cache.invalidate(lambda cls: bool(added.find(cls)))
+        nonlocal generation
+        generation += 1
+
+    @contextmanager
+    def bulk_register():
+        """with generic_func.bulk_register(): ...
+
+        Validates the registrations made inside the block right away but
+        defers adding them to the registry, the dominance analysis, engine
+        updates and cache invalidation to a single pass when the block exits.
+        If the block raises, none of its registrations are added.
+        """
+        nonlocal pending
+        if pending is not None:
+            # Nested blocks are committed by the outermost one
+            yield
+            return
+        pending = []
+        try:
+            yield
+        except BaseException:
+            # A failing block registers nothing
+            pending = None
+            raise
+        registrations, pending = pending, None
+        if registrations:
+            commit(registrations)
+
+    def specialize(*cls):
+        """generic_func.specialize(*cls) -> Specialization
+
+        Resolves the implementation for the argument types *cls* once, to be
+        called directly in loops over arguments of these types.
+        """
+        return Specialization(cls, dispatch, current_generation)
+
+    def callsite(size=4):
+        """generic_func.callsite(size=4) -> CallSite
+
+        Creates an inline cache of the last *size* argument-type tuples for
+        one call site, see CallSite.
+        """
+        return CallSite(wrapper, dispatch, current_generation, size)
+
+    def record(path):
+        """generic_func.record(path)
+
+        Appends every distinct argument-type tuple resolved from now on to
+        the file *path*, to be replayed with replay(), starting with the
+        tuples already in the dispatch cache. Recording stops with a *path*
+        of None, and when writing to *path* fails.
+        """
+        nonlocal recorder
+        if path is None:
+            recorder = None
+            return
+        recorder = _DispatchRecorder(path)
+        for key in list(dispatch_cache.data):
+            cls = dispatch_cache.classes(key)
+            if None not in cls:
+                recorder.record(cls)
+
+    def replay(path):
+        """generic_func.replay(path)
+
+        Resolves the argument-type tuples recorded in the file *path*.
+        Classes that cannot be imported anymore and ambiguous type tuples
+        are skipped.
+        """
+        for cls in _read_type_tuples(path):
+            try:
+                dispatch(cls)
+            except AmbiguousDispatchError:
+                pass
+
+    def warm(type_tuples=None):
+        """generic_func.warm(type_tuples=None)
+
+        Resolves every argument-type tuple of *type_tuples* ahead of time,
+        populating the dispatch cache and compiling lazily built engines.
+        By default every combination of the registered classes is resolved,
+        skipping ambiguous ones.
+        """
+        if deferred:
+            finalize()
+        prepare = getattr(resolver, "prepare", None)
+        if prepare is not None:
+            prepare()
+        if type_tuples is not None:
+            for cls in type_tuples:
+                dispatch(tuple(cls))
+            return
+        for members in list(signatures.values()):
+            for cls in itertools.product(*members):
+                try:
+                    dispatch(cls)
+                except AmbiguousDispatchError:
+                    pass
+
+    def update_omissions(key, type_tuples):
+        affected = set(omitted_by.pop(key, ()))
+        for type_tuple in affected:
+            omission_owners[type_tuple].discard(key)
+        omitted_by[key] = type_tuples
+        for type_tuple in type_tuples:
+            omission_owners.setdefault(type_tuple, set()).add(key)
+        affected.update(type_tuples)
+        for type_tuple in affected:
+            owners = omission_owners[type_tuple]
+            if len(owners) == 1:
+                omissions[type_tuple] = registry[next(iter(owners))]
+            else:
+                omissions.pop(type_tuple, None)
 
-    def wrapper(*args, **kw):
+    def call_generic(*args, **kw):
         if not args and not kw:
             raise TypeError(f"{funcname} requires at least 1 argument")
         cls_args = [arg.__class__ for arg in args]
 
-        if kw is not None:
-            cls_kw = [type(value) for value in kw.values()]
-            cls_args.extend(cls_kw)
+        if kw:
+            # Order keyword arguments by parameter position, independent of
+            # the order they were passed in. The type tuple stops at the first
+            # position that was not passed.
+            cls_kw = {}
+            for name, value in kw.items():
+                position = keyword_positions.get(name)
+                if position is not None:
+                    cls_kw[position] = value.__class__
+            position = len(cls_args)
+            while position in cls_kw:
+                cls_args.append(cls_kw[position])
+                position += 1
 
         return dispatch(tuple(cls_args))(*args, **kw)
 
+    if n_arguments:
+        wrapper = _make_fixed_arity_wrapper(parameters, dispatch, call_generic)
+    else:
+        wrapper = call_generic
     funcname = getattr(func, "__name__", "multidispatch function")
     registry[object] = func
     wrapper.register = register
+    wrapper.bulk_register = bulk_register
+    wrapper.finalize = finalize
     wrapper.dispatch = dispatch
+    wrapper.specialize = specialize
+    wrapper.warm = warm
+    wrapper.callsite = callsite
+    wrapper.record = record
+    wrapper.replay = replay
     wrapper.registry = types.MappingProxyType(registry)
+    if adaptive:
+        adapt_to_registry()
+    else:
+        set_strategy(engine)
+    wrapper.cache_info = dispatch_cache.info
+    wrapper.cache_clear = dispatch_cache.reset
     update_wrapper(wrapper, func)
+    _generic_functions.add(wrapper)
     return wrapper
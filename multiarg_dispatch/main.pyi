@@ -1,16 +1,86 @@
 # multidispatch.pyi
-from typing import Any, Callable, Mapping, Protocol, Tuple, TypeVar
+import os
+from contextlib import AbstractContextManager
+from typing import (
+    Any,
+    Callable,
+    Generic,
+    Iterable,
+    Mapping,
+    NamedTuple,
+    Protocol,
+    Tuple,
+    TypeVar,
+    overload,
+)
 
 T = TypeVar("T")
 R = TypeVar("R")
 
 class DispatchWarning(Warning): ...
+class AmbiguityWarning(DispatchWarning): ...
+class AmbiguousDispatchError(TypeError): ...
 
-def multidispatch(func: Callable[..., R]) -> "MultidispatchWrapper[R]": ...
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    maxsize: int | None
+    currsize: int
+
+class Specialization(Generic[R]):
+    types: Tuple[type, ...]
+    impl: Callable[..., R]
+    @property
+    def valid(self) -> bool: ...
+    def guard(self, *args: Any) -> bool: ...
+    def __call__(self, *args: Any, **kwargs: Any) -> R: ...
+
+class CallSite(Generic[R]):
+    size: int
+    def __call__(self, *args: Any, **kwargs: Any) -> R: ...
+
+def warm_all() -> None: ...
+@overload
+def multidispatch(
+    func: Callable[..., R],
+    *,
+    maxsize: int | None = ...,
+    engine: str = ...,
+    defaults: bool = ...,
+    lazy: bool = ...,
+) -> "MultidispatchWrapper[R]": ...
+@overload
+def multidispatch(
+    func: None = ...,
+    *,
+    maxsize: int | None = ...,
+    engine: str = ...,
+    defaults: bool = ...,
+    lazy: bool = ...,
+) -> Callable[[Callable[..., R]], "MultidispatchWrapper[R]"]: ...
 
 class MultidispatchWrapper(Protocol[R]):
     registry: Mapping[Tuple[type, ...], Callable[..., R]]
+    engine: Any
+    strategy: str
 
     def __call__(self, *args: Any, **kwargs: Any) -> R: ...
-    def register(self, func: Callable[..., R]) -> Callable[..., R]: ...
+    @overload
+    def register(
+        self, func: Callable[..., R], *, types: Tuple[Any, ...] | None = ...
+    ) -> Callable[..., R]: ...
+    @overload
+    def register(
+        self, cls: Any, /, *more: Any
+    ) -> Callable[[Callable[..., R]], Callable[..., R]]: ...
+    def bulk_register(self) -> AbstractContextManager[None]: ...
+    def finalize(self) -> None: ...
     def dispatch(self, cls: Tuple[type, ...]) -> Callable[..., R]: ...
+    def specialize(self, *cls: type) -> Specialization[R]: ...
+    def callsite(self, size: int = ...) -> CallSite[R]: ...
+    def warm(self, type_tuples: Iterable[Tuple[type, ...]] | None = ...) -> None: ...
+    def record(self, path: str | os.PathLike[str] | None) -> None: ...
+    def replay(self, path: str | os.PathLike[str]) -> None: ...
+    def cache_info(self) -> CacheInfo: ...
+    def cache_clear(self) -> None: ...
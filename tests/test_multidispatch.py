@@ -6,7 +6,13 @@ import warnings
 
 import pytest
 
-from multiarg_dispatch import DispatchWarning, multidispatch
+from multiarg_dispatch import (
+    AmbiguityWarning,
+    AmbiguousDispatchError,
+    DispatchWarning,
+    multidispatch,
+    warm_all,
+)
 
 
 # -------------------
@@ -18,19 +24,21 @@ def test_func_fixture():
     def test_func(a, b=None):
         return "default"
 
-    @test_func.register
-    def _(a: int, b: str = "default") -> str:
-        return f"int:{a},str:{b}"
+    with pytest.warns(DispatchWarning):
 
-    @test_func.register
-    def _(a: str, b: list = []) -> str:
-        if b is None:
-            b = []
-        return f"str:{a},list:{b}"
+        @test_func.register
+        def _(a: int, b: str = "default") -> str:
+            return f"int:{a},str:{b}"
 
-    @test_func.register
-    def _(a: float, b: str | list = "default") -> str:
-        return f"float:{a},union:{b}"
+        @test_func.register
+        def _(a: str, b: list = []) -> str:
+            if b is None:
+                b = []
+            return f"str:{a},list:{b}"
+
+        @test_func.register
+        def _(a: float, b: str | list = "default") -> str:
+            return f"float:{a},union:{b}"
 
     return test_func
 
@@ -187,3 +195,1033 @@ def test_registered_class_garbage_collection():
     assert weak_ref() is None, (
         "DynamicAnimal should be garbage collected after process function is deleted"
     )
+
+
+# -------------------
+# Dispatch cache
+# -------------------
+def test_dispatch_cache_invalidated_on_register():
+    class Base:
+        pass
+
+    class Child(Base):
+        pass
+
+    @multidispatch
+    def f(x):
+        return "default"
+
+    def _base(x):
+        return "base"
+
+    _base.__annotations__ = {"x": Base}
+    f.register(_base)
+
+    # The first call resolves through the subclass scan and caches the result
+    assert f(Child()) == "base"
+    assert f(Child()) == "base"
+
+    def _child(x):
+        return "child"
+
+    _child.__annotations__ = {"x": Child}
+    f.register(_child)
+
+    assert f(Child()) == "child"
+    assert f(Base()) == "base"
+
+
+def test_default_fallback_cache_invalidated_on_register():
+    @multidispatch
+    def f(x):
+        return "default"
+
+    assert f(b"raw") == "default"
+    assert f(b"raw") == "default"
+
+    @f.register
+    def _(x: bytes) -> str:
+        return "bytes"
+
+    assert f(b"raw") == "bytes"
+
+
+# -------------------
+# Bounded cache
+# -------------------
+def test_cache_info_and_lru_eviction():
+    @multidispatch(maxsize=2)
+    def f(x):
+        return "default"
+
+    @f.register
+    def _(x: int) -> str:
+        return "int"
+
+    f(1)
+    f(1)
+    assert f.cache_info() == (1, 1, 0, 2, 1)
+
+    f("a")
+    f(1)  # refresh (int,) so that (str,) is the least recently used entry
+    f(b"b")
+    info = f.cache_info()
+    assert info.evictions == 1
+    assert info.currsize == 2
+
+    # (str,) was evicted and has to be resolved again
+    misses = info.misses
+    f("a")
+    assert f.cache_info().misses == misses + 1
+
+    f.cache_clear()
+    assert f.cache_info() == (0, 0, 0, 2, 0)
+
+
+def test_cache_disabled_with_zero_maxsize():
+    @multidispatch(maxsize=0)
+    def f(x):
+        return "default"
+
+    assert f(1) == "default"
+    assert f(1) == "default"
+    assert f.cache_info().currsize == 0
+
+
+def test_dispatch_cache_does_not_keep_argument_classes_alive():
+    import gc
+    import weakref
+
+    @multidispatch
+    def f(x):
+        return "default"
+
+    @f.register
+    def _(x: int) -> str:
+        return "int"
+
+    Dynamic = type("Dynamic", (int,), {})
+    weak_ref = weakref.ref(Dynamic)
+
+    assert f(Dynamic(1)) == "int"
+    assert f.cache_info().currsize == 1
+
+    del Dynamic
+    gc.collect()
+
+    assert weak_ref() is None
+    assert f.cache_info().currsize == 0
+    assert f(1) == "int"
+
+
+def test_dispatch_cache_invalidated_on_abc_registration():
+    import abc
+
+    class Shape(abc.ABC):
+        pass
+
+    class Square:
+        pass
+
+    @multidispatch
+    def f(x):
+        return "default"
+
+    def _shape(x):
+        return "shape"
+
+    _shape.__annotations__ = {"x": Shape}
+    f.register(_shape)
+
+    assert f(Square()) == "default"
+
+    Shape.register(Square)
+    assert f(Square()) == "shape"
+
+
+# -------------------
+# Resolution engines
+# -------------------
+class _A:
+    pass
+
+
+class _B(_A):
+    pass
+
+
+class _C(_B):
+    pass
+
+
+def _build_hierarchy_func(engine):
+    @multidispatch(engine=engine)
+    def f(x, y):
+        return "default"
+
+    @f.register
+    def _(x: _B, y: int | str) -> str:
+        return "B,int|str"
+
+    @f.register
+    def _(x: _A, y: int) -> str:
+        return "A,int"
+
+    @f.register
+    def _(x: _C, y: object) -> str:
+        return "C,object"
+
+    return f
+
+
+@pytest.mark.parametrize("engine", ["scan", "index", "bitset", "tree", "mro"])
+def test_engines_resolve_subclasses(engine):
+    f = _build_hierarchy_func(engine)
+    assert f(_A(), 1) == "A,int"
+    assert f(_B(), 1) == "B,int|str"
+    assert f(_C(), "s") == "B,int|str"
+    assert f(_C(), 1.5) == "C,object"
+    assert f(_A(), "s") == "default"
+    assert f.dispatch((_B,))(_B(), 1) == "B,int|str"
+    assert f(object(), 1) == "default"
+
+
+def test_tree_engine_is_rebuilt_after_register():
+    f = _build_hierarchy_func("tree")
+    assert f.engine.depth == 1
+    assert f.engine.node_count == 4
+
+    @f.register
+    def _(x: _C, y: bytes) -> str:
+        return "C,bytes"
+
+    assert f(_C(), b"") == "C,bytes"
+    assert f.engine.depth == 2
+    assert f.engine.node_count == 7
+
+
+def test_auto_strategy_follows_registry_size():
+    @multidispatch
+    def f(x):
+        return "default"
+
+    assert f.strategy == "exact"
+    assert f(1) == "default"
+
+    @f.register
+    def _(x: int) -> str:
+        return "int"
+
+    assert f.strategy == "scan"
+    assert f(True) == "int"
+
+    for cls in (str, bytes, list, dict, set, tuple, frozenset, complex):
+
+        def _impl(x):
+            return "other"
+
+        _impl.__annotations__ = {"x": cls}
+        f.register(_impl)
+
+    assert f.strategy == "index"
+    assert f(True) == "int"
+    assert f("a") == "other"
+
+    def _b(x):
+        return "B"
+
+    _b.__annotations__ = {"x": _B}
+    f.register(_b)
+
+    assert f.strategy == "index"
+    assert f(_C()) == "B"
+
+
+def test_auto_strategy_indexes_on_high_miss_rate():
+    @multidispatch(maxsize=0)
+    def f(x):
+        return "default"
+
+    @f.register
+    def _(x: int) -> str:
+        return "int"
+
+    for _ in range(100):
+        assert f(True) == "int"
+    assert f.strategy == "index"
+
+
+def test_explicit_engine_is_reported_as_strategy():
+    @multidispatch(engine="bitset")
+    def f(x):
+        return "default"
+
+    assert f.strategy == "bitset"
+
+
+def test_mro_engine_pivots_on_most_discriminating_position():
+    @multidispatch(engine="mro")
+    def f(x, y):
+        return "default"
+
+    assert f(1, 1) == "default"
+
+    @f.register
+    def _(x: object, y: int) -> str:
+        return "object,int"
+
+    @f.register
+    def _(x: object, y: str) -> str:
+        return "object,str"
+
+    assert f.engine.pivot == 1
+    assert f(_C(), True) == "object,int"
+
+
+def test_unknown_engine_raises_valueerror():
+    with pytest.raises(ValueError):
+
+        @multidispatch(engine="unknown")
+        def f(x):
+            return x
+
+
+# -------------------
+# Generated wrapper
+# -------------------
+def test_fixed_arity_wrapper_falls_back_for_other_call_shapes(test_func_fixture):
+    assert test_func_fixture(5, "x") == "int:5,str:x"
+    assert test_func_fixture(5) == "int:5,str:default"
+    assert test_func_fixture(5, b="x") == "int:5,str:x"
+    with pytest.raises(TypeError):
+        test_func_fixture(5, "x", "extra")
+    assert test_func_fixture.__name__ == "test_func"
+
+
+def test_keyword_order_does_not_affect_dispatch(test_func_fixture):
+    assert test_func_fixture(b="kw", a=10) == "int:10,str:kw"
+    assert test_func_fixture(a=10, b="kw") == "int:10,str:kw"
+    assert test_func_fixture(10, "kw") == "int:10,str:kw"
+    assert test_func_fixture(10, b="kw") == "int:10,str:kw"
+    # All call shapes share a single cache entry
+    assert test_func_fixture.cache_info().currsize == 1
+
+
+def test_keyword_calls_fill_wrapper_slots():
+    import inspect
+
+    @multidispatch
+    def f(a, /, b=None, c=None):
+        return ("default", a, b, c)
+
+    @f.register
+    def _(a: int, b: str, c: int) -> tuple:
+        return ("int", a, b, c)
+
+    assert f(1, c=3, b="x") == ("int", 1, "x", 3)
+    assert f("s", c=3) == ("default", "s", None, 3)
+    assert list(inspect.signature(f).parameters) == ["a", "b", "c"]
+
+    @multidispatch
+    def g(args, *, kw=None):
+        return ("default", args, kw)
+
+    @g.register
+    def _(args: int, kw: str) -> tuple:
+        return ("int", args, kw)
+
+    assert g(1, kw="x") == ("int", 1, "x")
+
+
+# -------------------
+# Default-aware dispatch
+# -------------------
+def test_default_aware_dispatch_resolves_omitted_arguments():
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", DispatchWarning)
+
+        @multidispatch(defaults=True)
+        def f(a, b=None, c=None):
+            return "default"
+
+        @f.register
+        def _(a: object, b: int, c: int) -> str:
+            return "object,int,int"
+
+        @f.register
+        def _(a: int, b: str = "b", c: int | str = 0) -> str:
+            return f"int,{b},{c}"
+
+    assert f(1) == "int,b,0"
+    assert f(1, "x") == "int,x,0"
+    assert f(1, "x", "y") == "int,x,y"
+    assert f.dispatch((int,)) is f.dispatch((int, str))
+
+
+def test_default_aware_dispatch_ignores_conflicting_omissions():
+    @multidispatch(defaults=True)
+    def f(a, b=None):
+        return "default"
+
+    @f.register
+    def _(a: int, b: str = "") -> str:
+        return "int,str"
+
+    assert f(1) == "int,str"
+
+    @f.register
+    def _(a: int, b: list = []) -> str:
+        return "int,list"
+
+    # (int,) is accepted by both signatures, it is resolved by the engine
+    with pytest.raises(AmbiguousDispatchError):
+        f(1)
+    assert f(1, []) == "int,list"
+
+
+# -------------------
+# Most specific match
+# -------------------
+@pytest.mark.parametrize("defaults", [False, True])
+def test_omitted_arguments_skip_implementations_without_defaults(defaults):
+    @multidispatch(defaults=defaults)
+    def f(a, b):
+        return "default"
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DispatchWarning)
+
+        @f.register
+        def _(a: _A, b: str = "x") -> str:
+            return "base"
+
+    @f.register
+    def _(a: _B, b: int) -> str:
+        return "derived"
+
+    assert f(_B()) == "base"
+    assert f(_B(), 1) == "derived"
+
+
+@pytest.mark.parametrize("engine", ["scan", "index", "bitset", "tree", "mro"])
+def test_most_specific_match_wins_over_registration_order(engine):
+    @multidispatch(engine=engine)
+    def f(x, y):
+        return "default"
+
+    @f.register
+    def _(x: object, y: int) -> str:
+        return "object,int"
+
+    @f.register
+    def _(x: _A, y: int) -> str:
+        return "A,int"
+
+    @f.register
+    def _(x: _B, y: int | str) -> str:
+        return "B,int|str"
+
+    @f.register
+    def _(x: _B, y: int) -> str:
+        return "B,int"
+
+    assert f(_A(), 1) == "A,int"
+    assert f(_C(), 1) == "B,int"
+    assert f(_C(), "s") == "B,int|str"
+    assert f(1, 1) == "object,int"
+
+
+@pytest.mark.parametrize("engine", ["scan", "index", "bitset", "tree", "mro"])
+def test_incomparable_candidates_raise_ambiguity_error(engine):
+    @multidispatch(engine=engine)
+    def f(x, y):
+        return "default"
+
+    @f.register
+    def _(x: int, y: object) -> str:
+        return "int,object"
+
+    with pytest.warns(AmbiguityWarning):
+
+        @f.register
+        def _(x: object, y: int) -> str:
+            return "object,int"
+
+    assert f(1, "s") == "int,object"
+    with pytest.raises(AmbiguousDispatchError):
+        f(1, 1)
+
+
+# -------------------
+# Registration-time analysis
+# -------------------
+def test_ties_resolved_by_a_closer_signature_do_not_warn():
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", AmbiguityWarning)
+        f = _build_hierarchy_func("scan")
+    # (_C, object) and (_A, int) tie at (_C, int), (_B, int | str) is closer
+    assert f(_C(), 1) == "B,int|str"
+
+
+def test_dominated_signatures_do_not_warn():
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", AmbiguityWarning)
+
+        @multidispatch
+        def f(x, y):
+            return "default"
+
+        @f.register
+        def _(x: int | str, y: object) -> str:
+            return "int|str,object"
+
+        @f.register
+        def _(x: int, y: int) -> str:
+            return "int,int"
+
+        @f.register
+        def _(x: _B, y: int) -> str:
+            return "B,int"
+
+        @f.register
+        def _(x: _A, y: int | str) -> str:
+            return "A,int|str"
+
+    assert f(True, 1) == "int,int"
+    assert f("s", 1) == "int|str,object"
+    assert f(_C(), 1) == "B,int"
+    assert f(_C(), "s") == "A,int|str"
+
+
+# -------------------
+# Protocols
+# -------------------
+@pytest.mark.parametrize("engine", ["scan", "index", "bitset", "tree", "mro"])
+def test_protocol_signatures_dispatch(engine):
+    from typing import Protocol, runtime_checkable
+
+    @runtime_checkable
+    class Closeable(Protocol):
+        def close(self): ...
+
+    class Resource:
+        def close(self):
+            pass
+
+    @multidispatch(engine=engine)
+    def f(x):
+        return "default"
+
+    def _closeable(x):
+        return "closeable"
+
+    _closeable.__annotations__ = {"x": Closeable}
+    f.register(_closeable)
+    assert f(Resource()) == "closeable"
+    assert f(1) == "default"
+
+
+# -------------------
+# Specialization
+# -------------------
+def test_specialize_returns_direct_handle(test_func_fixture):
+    handle = test_func_fixture.specialize(int, str)
+    assert handle.impl is test_func_fixture.dispatch((int, str))
+    assert handle(1, "a") == "int:1,str:a"
+    assert handle.guard(1, "a")
+    assert not handle.guard(True, "a")
+    assert not handle.guard(1)
+
+
+def test_specialize_survives_unrelated_registrations(test_func_fixture):
+    handle = test_func_fixture.specialize(int, str)
+
+    @test_func_fixture.register
+    def _(a: bytes, b: str) -> str:
+        return "bytes"
+
+    assert handle.valid
+    assert handle(1, "a") == "int:1,str:a"
+
+
+def test_specialize_raises_after_resolution_changed():
+    @multidispatch
+    def f(x):
+        return "default"
+
+    handle = f.specialize(bool)
+    assert handle(True) == "default"
+
+    @f.register
+    def _(x: int) -> str:
+        return "int"
+
+    assert not handle.valid
+    with pytest.raises(RuntimeError):
+        handle(True)
+    assert f.specialize(bool)(True) == "int"
+
+
+def test_specialize_detects_abc_registration():
+    import abc
+
+    class Shape(abc.ABC):
+        pass
+
+    class Square:
+        pass
+
+    @multidispatch
+    def f(x):
+        return "default"
+
+    def _shape(x):
+        return "shape"
+
+    _shape.__annotations__ = {"x": Shape}
+    f.register(_shape)
+    handle = f.specialize(Square)
+    assert handle(Square()) == "default"
+
+    Shape.register(Square)
+    assert not handle.valid
+    with pytest.raises(RuntimeError):
+        handle(Square())
+
+
+# -------------------
+# Warm-up
+# -------------------
+def test_warm_resolves_given_type_tuples(test_func_fixture):
+    test_func_fixture.warm([(bool, str), (float,)])
+    info = test_func_fixture.cache_info()
+    assert (info.misses, info.currsize) == (2, 2)
+
+    assert test_func_fixture(True, "a") == "int:True,str:a"
+    assert test_func_fixture.cache_info().hits == 1
+
+
+def test_warm_all_resolves_registered_classes():
+    @multidispatch(engine="tree")
+    def f(x, y):
+        return "default"
+
+    @f.register
+    def _(x: int | float, y: str) -> str:
+        return "number,str"
+
+    warm_all()
+    assert f.cache_info().currsize == 2
+    assert f.engine.node_count == 1
+    misses = f.cache_info().misses
+    assert f(1.5, "s") == "number,str"
+    assert f.cache_info().misses == misses
+
+
+# -------------------
+# Record and replay
+# -------------------
+def test_record_and_replay_resolved_type_tuples(tmp_path):
+    path = tmp_path / "dispatch.txt"
+
+    def make():
+        @multidispatch
+        def f(x, y):
+            return "default"
+
+        @f.register
+        def _(x: int, y: int) -> str:
+            return "int,int"
+
+        return f
+
+    f = make()
+    f.record(path)
+    f(True, 1)
+    f(True, 2)
+    f(_C(), 1)
+
+    class Local:
+        pass
+
+    f(Local(), 1)
+    f.record(None)
+    f(1.5, 1)
+
+    assert path.read_text().splitlines() == [
+        "builtins:bool,builtins:int",
+        f"{__name__}:_C,builtins:int",
+    ]
+
+    with path.open("a") as file:
+        file.write("missing.module:Class,builtins:int\n")
+
+    g = make()
+    g.replay(path)
+    assert g.cache_info().currsize == 2
+    assert g(True, 1) == "int,int"
+    assert g.cache_info().hits == 1
+
+
+def test_record_includes_cached_type_tuples(tmp_path):
+    path = tmp_path / "dispatch.txt"
+
+    @multidispatch
+    def f(x):
+        return "default"
+
+    @f.register
+    def _(x: int) -> str:
+        return "int"
+
+    f(1)
+    f.record(path)
+    f(1)
+    f(True)
+    assert path.read_text().splitlines() == ["builtins:int", "builtins:bool"]
+
+
+def test_record_stops_when_writing_fails(tmp_path):
+    @multidispatch
+    def f(x):
+        return "default"
+
+    @f.register
+    def _(x: int) -> str:
+        return "int"
+
+    f.record(tmp_path / "missing" / "dispatch.txt")
+    with pytest.warns(DispatchWarning, match="Stopped recording"):
+        assert f(1) == "int"
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        assert f(True) == "int"
+
+
+def test_replay_of_missing_file_is_a_no_op(tmp_path):
+    @multidispatch
+    def f(x):
+        return "default"
+
+    f.replay(tmp_path / "missing.txt")
+    assert f.cache_info().currsize == 0
+
+
+# -------------------
+# Call-site caches
+# -------------------
+def test_callsite_keeps_last_type_tuples(test_func_fixture):
+    site = test_func_fixture.callsite(size=2)
+    assert site(1, "a") == "int:1,str:a"
+    assert site("s", []) == "str:s,list:[]"
+    assert site(1.5, "b") == "float:1.5,union:b"
+    assert list(site.entries) == [(str, list), (float, str)]
+    assert site(a=1, b="kw") == "int:1,str:kw"
+    with pytest.raises(TypeError):
+        site()
+
+
+def test_callsite_is_invalidated_by_register():
+    @multidispatch
+    def f(x):
+        return "default"
+
+    @f.register
+    def _(x: int) -> str:
+        return "int"
+
+    site = f.callsite(size=1)
+    assert site(True) == "int"
+
+    @f.register
+    def _(x: bool) -> str:
+        return "bool"
+
+    assert site(True) == "bool"
+
+
+def test_callsite_is_invalidated_by_abc_registration():
+    import abc
+
+    class Shape(abc.ABC):
+        pass
+
+    class Square:
+        pass
+
+    @multidispatch
+    def f(x):
+        return "default"
+
+    def _shape(x):
+        return "shape"
+
+    _shape.__annotations__ = {"x": Shape}
+    f.register(_shape)
+    site = f.callsite(size=1)
+    assert site(Square()) == "default"
+
+    Shape.register(Square)
+    assert site(Square()) == "shape"
+
+
+# -------------------
+# Precise invalidation
+# -------------------
+def test_register_only_invalidates_matching_cache_entries(test_func_fixture):
+    assert test_func_fixture(True, "a") == "int:True,str:a"
+    assert test_func_fixture("s", []) == "str:s,list:[]"
+    assert test_func_fixture(1.5, "b") == "float:1.5,union:b"
+    assert test_func_fixture.cache_info().currsize == 3
+
+    @test_func_fixture.register
+    def _(a: bool, b: str) -> str:
+        return f"bool:{a},str:{b}"
+
+    assert test_func_fixture.cache_info().currsize == 2
+    hits = test_func_fixture.cache_info().hits
+    assert test_func_fixture("s", []) == "str:s,list:[]"
+    assert test_func_fixture(1.5, "b") == "float:1.5,union:b"
+    assert test_func_fixture.cache_info().hits == hits + 2
+    assert test_func_fixture(True, "a") == "bool:True,str:a"
+
+
+def test_register_survives_collection_during_invalidation():
+    import abc
+    import gc
+
+    class Collecting(abc.ABC):
+        @classmethod
+        def __subclasshook__(cls, other):
+            if other.__name__.startswith("Temporary"):
+                gc.collect()
+            return NotImplemented
+
+    @multidispatch
+    def f(x):
+        return "default"
+
+    @f.register
+    def _(x: int) -> str:
+        return "int"
+
+    for i in range(20):
+        f(type(f"Temporary{i}", (), {})())
+        f(i)
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+
+        def _collecting(x):
+            return "collecting"
+
+        _collecting.__annotations__ = {"x": Collecting}
+        f.register(_collecting)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    assert f(1) == "int"
+
+
+# -------------------
+# Bulk registration
+# -------------------
+@pytest.mark.parametrize("engine", ["auto", "scan", "index", "bitset", "tree", "mro"])
+def test_bulk_register_commits_on_exit(engine):
+    @multidispatch(engine=engine)
+    def f(x, y):
+        return "default"
+
+    def make_impl(cls, y, result):
+        def impl(x, y):
+            return result
+
+        impl.__annotations__ = {"x": cls, "y": y}
+        return impl
+
+    classes = [type(f"K{i}", (), {}) for i in range(20)]
+    assert f(classes[3](), 1) == "default"
+    with f.bulk_register():
+        for i, cls in enumerate(classes):
+            f.register(make_impl(cls, int, i))
+        with f.bulk_register():
+            f.register(make_impl(classes[0], bool, "nested"))
+        assert f(classes[3](), 1) == "default"
+        assert f(classes[4](), 1) == "default"
+        assert len(f.registry) == 1
+    assert f(classes[3](), 1) == 3
+    assert f(classes[0](), True) == "nested"
+    assert f(classes[0](), 1) == 0
+    if engine == "auto":
+        assert f.strategy == "index"
+
+
+def test_bulk_register_discards_registrations_on_error():
+    @multidispatch
+    def f(x):
+        return "default"
+
+    def _int(x: int) -> str:
+        return "int"
+
+    def _str(x: str) -> str:
+        return "str"
+
+    with pytest.raises(ImportError):
+        with f.bulk_register():
+            f.register(_int)
+            raise ImportError
+    assert len(f.registry) == 1
+    assert f(1) == "default"
+    with f.bulk_register():
+        f.register(_str)
+    assert f("s") == "str"
+    assert f(1) == "default"
+
+
+# -------------------
+# Explicit types
+# -------------------
+def test_register_explicit_types():
+    import operator
+    from functools import partial
+
+    @multidispatch
+    def f(x, y):
+        return "default"
+
+    f.register(int, int)(operator.add)
+    f.register(partial(operator.mul), types=(str, int))
+
+    @f.register(float, str | bytes)
+    def _(x, y):
+        return "float"
+
+    assert f(1, 2) == 3
+    assert f("ab", 2) == "abab"
+    assert f(1.0, b"") == "float"
+    assert f(1.0, 1.0) == "default"
+    with pytest.raises(TypeError, match="Expected 2 types"):
+        f.register(int)(operator.neg)
+    with pytest.raises(TypeError, match="Invalid type"):
+        f.register(operator.add, types=(int, "str"))
+    with pytest.raises(TypeError, match="is not a class"):
+        f.register(operator.add, int)
+
+
+def test_explicit_types_skip_implementations_requiring_omitted_arguments():
+    @multidispatch
+    def f(a, b=None):
+        return "default"
+
+    with pytest.warns(DispatchWarning):
+
+        @f.register
+        def _(a: int, b: str = "x") -> str:
+            return "int"
+
+    f.register(bool, str)(lambda a, b: "bool")
+    f.register(bool, bytes)(max)
+    assert f(True) == "int"
+    assert f(True, "s") == "bool"
+
+
+def test_register_builtin_type_as_implementation():
+    @multidispatch
+    def f(x):
+        return "default"
+
+    f.register(str, types=(int,))
+    f.register(float)(int)
+    assert f(1) == "1"
+    assert f(1.5) == 1
+    assert f(b"") == "default"
+    assert len(f.registry) == 3
+    with pytest.raises(TypeError, match="not both"):
+        f.register(str, int, types=(int,))
+
+
+def test_register_explicit_types_with_defaults():
+    @multidispatch(defaults=True)
+    def f(x, y):
+        return "default"
+
+    def impl(x, y=None):
+        return "impl"
+
+    f.register(impl, types=(int, str))
+    f.register(str, str)(max)
+    assert f(1) == "impl"
+    assert f("a", "b") == "b"
+
+
+# -------------------
+# Lazy annotations
+# -------------------
+def test_lazy_register_resolves_forward_references_on_first_call():
+    @multidispatch(lazy=True)
+    def f(x, y):
+        return "default"
+
+    assert f(1, 2) == "default"
+
+    @f.register
+    def _(x: _Later, y: int) -> str:
+        return "later"
+
+    @f.register
+    def _(x: int, y: int) -> str:
+        return "int"
+
+    assert len(f.registry) == 1
+    assert f(_Later(), 1) == "later"
+    assert f(1, 2) == "int"
+    assert len(f.registry) == 3
+
+
+def test_lazy_register_retries_unresolved_hints():
+    @multidispatch(lazy=True)
+    def f(x):
+        return "default"
+
+    site = f.callsite()
+    assert site(1) == "default"
+
+    @f.register
+    def _(x: int) -> str:
+        return "int"
+
+    @f.register
+    def _(x: _Missing) -> str:  # noqa: F821
+        return "missing"
+
+    with pytest.raises(NameError):
+        f.finalize()
+    with pytest.raises(NameError):
+        site(1)
+    assert len(f.registry) == 2
+    missing = globals()["_Missing"] = type("_Missing", (), {})
+    try:
+        assert site(1) == "int"
+        assert f(missing()) == "missing"
+        assert len(f.registry) == 3
+    finally:
+        del globals()["_Missing"]
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_lazy_register_keeps_registration_order(lazy):
+    @multidispatch(lazy=lazy)
+    def f(x):
+        return "default"
+
+    @f.register
+    def _(x: int) -> str:
+        return "annotated"
+
+    f.register(int)(lambda x: "explicit")
+    assert f(1) == "explicit"
+
+
+class _Later:
+    pass